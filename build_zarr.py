@@ -0,0 +1,81 @@
+"""
+Convert a time series of GeoTIFFs on S3 into a single Zarr store for venezia.py.
+
+The store is written beside the GeoTIFFs' prefix, as prefix/path.zarr, with one
+(time, y, x) variable chunked one time step at a time. Rasters are reprojected
+to EPSG:4326 and reduced to display resolution, so the viewer can read a time
+step with a few chunk requests instead of opening a GeoTIFF.
+
+AWS credentials are taken from the usual environment variables.
+
+Usage:
+    python build_zarr.py s3://bucket-name/prefix/path
+"""
+import argparse
+import math
+import os
+
+import boto3
+import rioxarray
+import xarray as xr
+from numcodecs import Blosc
+from rasterio.enums import Resampling
+
+from venezia import (
+    DISPLAY_MAX_SIZE, ZARR_SOURCE_ETAGS, ZARR_VARIABLE,
+    list_geotiff_objects, parse_s3_url, zarr_store_key
+)
+
+CHUNK_SIZE = 512
+
+def load_display_raster(url, max_size=DISPLAY_MAX_SIZE):
+    """Open a GeoTIFF as EPSG:4326 at no more than max_size pixels per side"""
+    da = rioxarray.open_rasterio(
+        url, chunks={'x': CHUNK_SIZE, 'y': CHUNK_SIZE}
+    ).isel(band=0, drop=True)
+    if da.rio.crs is not None and da.rio.crs.to_epsg() != 4326:
+        da = da.rio.reproject('EPSG:4326', resampling=Resampling.average)
+    factor = math.ceil(max(da.sizes['x'], da.sizes['y']) / max_size)
+    if factor > 1:
+        da = da.coarsen(x=factor, y=factor, boundary='trim').mean()
+    return da.drop_vars('spatial_ref', errors='ignore')
+
+def build_zarr(s3_path):
+    """Write the Zarr store for the GeoTIFFs under s3_path and return its URL"""
+    bucket, prefix = parse_s3_url(s3_path)
+    store_key = zarr_store_key(prefix)
+    if store_key is None:
+        raise SystemExit("GeoTIFFs must be under a prefix, so the store can be written beside it")
+    # List exactly as the viewer does, so time steps line up with its slider
+    objects = list_geotiff_objects(boto3.client('s3'), bucket, prefix)
+    if not objects:
+        raise SystemExit(f"No GeoTIFF files found under {s3_path}")
+    urls = [obj.url for obj in objects]
+
+    da = xr.concat([load_display_raster(url) for url in urls], dim='time')
+    da = da.assign_coords(time=[os.path.basename(url) for url in urls])
+    ds = da.astype('float32').to_dataset(name=ZARR_VARIABLE)
+    # Lets the viewer detect GeoTIFFs re-uploaded after the store was built
+    ds.attrs[ZARR_SOURCE_ETAGS] = [obj.etag for obj in objects]
+    ds = ds.chunk({'time': 1, 'y': CHUNK_SIZE, 'x': CHUNK_SIZE})
+
+    store_url = f"s3://{bucket}/{store_key}"
+    ds.to_zarr(
+        store_url,
+        mode='w',
+        consolidated=True,
+        encoding={ZARR_VARIABLE: {
+            'chunks': (1, CHUNK_SIZE, CHUNK_SIZE),
+            'compressor': Blosc(cname='zstd', clevel=3)
+        }}
+    )
+    return store_url
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('s3_path', help="S3 path holding the GeoTIFFs")
+    args = parser.parse_args()
+    print(f"Wrote {build_zarr(args.s3_path)}")
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,103 @@ import streamlit as st
 import rasterio
 import folium
 from folium.plugins import TimestampedGeoJson
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
 import numpy as np
+import pydeck as pdk
+from PIL import Image
 import glob
 import os
-from datetime import datetime
+import math
+import io
+import base64
+import contextlib
+import threading
+from datetime import datetime, timedelta
 from branca.colormap import LinearColormap
 import pandas as pd
 import boto3
-from botocore.exceptions import NoCredentialsError
+from botocore.config import Config
+from botocore.exceptions import ClientError, NoCredentialsError
 import tempfile
 import rasterio
 from rasterio.session import AWSSession
+from rasterio.coords import BoundingBox
+from rasterio.crs import CRS
+from rasterio.transform import Affine, array_bounds
+from rasterio.enums import Resampling
+from rasterio.features import shapes
+from rasterio.vrt import WarpedVRT
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import namedtuple
+
+try:
+    import xarray as xr
+except ImportError:  # xarray is optional; GeoTIFFs are read directly without it
+    xr = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; colorize falls back to NumPy
+    njit = prange = None
+
+# JMESPath projection applied to each list_objects_v2 page while paging; the
+# ETag and size are used to version cached rasters without a HEAD per file
+OBJECTS_EXPRESSION = "Contents[].{Key: Key, ETag: ETag, Size: Size}"
+
+GEOTIFF_EXTENSIONS = ('.tif', '.tiff')
+
+# Pooled, keep-alive connections shared by the cached S3 client
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=32,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    tcp_keepalive=True
+)
+
+# Number of time steps on each side of the selected one to load in the background
+PREFETCH_RADIUS = 2
+PREFETCH_WORKERS = 8
+
+# Zarr store written by build_zarr.py beside the GeoTIFFs' prefix
+ZARR_STORE_SUFFIX = '.zarr'
+ZARR_VARIABLE = 'band1'
+# Store attribute listing the ETags of the GeoTIFFs it was built from, in order
+ZARR_SOURCE_ETAGS = 'source_etags'
+
+# The flood animation vectorizes each time step on a grid of at most this many
+# pixels per side, and draws at most this many polygons in total
+FLOOD_GRID_SIZE = 256
+FLOOD_MAX_FEATURES = 20000
+
+# Time axis of the flood animation, one step per GeoTIFF
+ANIMATION_START = datetime(2000, 1, 1)
+ANIMATION_PERIOD = timedelta(hours=1)
+
+# Rasters up to this size are downloaded whole in a single GET, which costs
+# less than GDAL's serial range requests; larger ones are read in place so
+# only the overview blocks needed for display are fetched
+IN_MEMORY_MAX_BYTES = 4 * 1024 * 1024
+
+# Height, in pixels, of the embedded map
+MAP_HEIGHT = 600
+
+# CRS rasters are displayed in; folium overlays are positioned in lat/lon
+DISPLAY_CRS = CRS.from_epsg(4326)
+
+# Largest raster dimension, in pixels, read for display
+DISPLAY_MAX_SIZE = 2048
+
+# GDAL options for reading GeoTIFFs over /vsis3/
+GDAL_ENV_OPTIONS = {
+    # Skip listing the parent prefix to look for sidecar files on every open
+    'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+    'CPL_VSIL_CURL_ALLOWED_EXTENSIONS': '.tif,.tiff',
+    'GDAL_HTTP_MULTIPLEX': 'YES',
+    'VSI_CACHE': 'TRUE',
+    'VSI_CACHE_SIZE': 268435456,  # 256 MB
+    # Fetch the COG header and IFDs in a single request
+    'GDAL_INGESTED_BYTES_AT_OPEN': 32768,
+}
 
 def parse_s3_url(s3_url):
     """Parse S3 URL into bucket name and prefix"""
@@ -65,47 +149,446 @@ def get_aws_credentials():
     
     return aws_credentials
 
-def list_s3_files(bucket, prefix='', credentials=None):
-    """List all GeoTIFF files in the specified S3 bucket and prefix"""
-    try:
-        s3_client = boto3.client('s3',
+@st.cache_resource
+def _s3_client(credentials):
+    """Return an S3 client shared across reruns for the given credentials"""
+    return boto3.client('s3',
+        aws_access_key_id=credentials['access_key_id'],
+        aws_secret_access_key=credentials['secret_access_key'],
+        region_name=credentials['region'],
+        config=S3_CLIENT_CONFIG
+    )
+
+def get_aws_session(credentials):
+    """Return the rasterio AWS session for the given credentials, reused across reruns"""
+    key = (
+        credentials['access_key_id'],
+        credentials['secret_access_key'],
+        credentials['region']
+    )
+    sessions = st.session_state.setdefault('aws_sessions', {})
+    if key not in sessions:
+        sessions[key] = AWSSession(
             aws_access_key_id=credentials['access_key_id'],
             aws_secret_access_key=credentials['secret_access_key'],
             region_name=credentials['region']
         )
+    return sessions[key]
+
+S3Object = namedtuple('S3Object', ['url', 'etag', 'size'])
+
+def is_geotiff(key):
+    """Return True if an S3 key names a GeoTIFF, whatever the extension's case"""
+    return key.lower().endswith(GEOTIFF_EXTENSIONS)
+
+def list_geotiff_objects(s3_client, bucket, prefix=''):
+    """List the GeoTIFFs under an S3 prefix as S3Objects, in key order"""
+    # Handle empty prefix
+    if prefix and not prefix.endswith('/'):
+        prefix = prefix + '/'
         
-        # Handle empty prefix
-        if prefix and not prefix.endswith('/'):
-            prefix = prefix + '/'
-            
-        response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-        
-        files = []
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                if obj['Key'].lower().endswith(('.tif', '.tiff')):
-                    files.append(f"s3://{bucket}/{obj['Key']}")
-        return files
-    except NoCredentialsError:
-        st.error("AWS credentials not found or invalid")
-        return []
-    except Exception as e:
-        st.error(f"Error accessing S3: {str(e)}")
-        return []
+    # Paginate so buckets with more than 1000 objects are fully listed
+    paginator = s3_client.get_paginator('list_objects_v2')
+    pages = paginator.paginate(
+        Bucket=bucket,
+        Prefix=prefix,
+        PaginationConfig={'PageSize': 1000}
+    )
+    objects = pages.search(OBJECTS_EXPRESSION)
+    
+    return [
+        S3Object(f"s3://{bucket}/{obj['Key']}", obj['ETag'], obj['Size'])
+        for obj in objects
+        if obj is not None and is_geotiff(obj['Key'])
+    ]
+
+@st.cache_data(ttl=300)
+def list_s3_files(bucket, prefix='', credentials=None):
+    """
+    List all GeoTIFF files in the specified S3 bucket and prefix as S3Objects.
+    
+    Errors are raised rather than reported here, so a failed listing is not
+    cached as an empty one.
+    """
+    return list_geotiff_objects(_s3_client(credentials), bucket, prefix)
+
+# rasterio environment kept open per thread, see gdal_env
+_gdal_env_local = threading.local()
+
+def gdal_env(aws_session):
+    """
+    Ensure this thread has a rasterio environment configured for reading
+    rasters from S3, and return a context manager for the read.
+    
+    The environment is entered once per thread and AWS session and left open,
+    rather than set up and torn down around every open, so GDAL's curl
+    connections and VSI cache carry over between reads in long-lived threads
+    such as the prefetch pool.
+    """
+    if getattr(_gdal_env_local, 'session', None) is not aws_session:
+        env = getattr(_gdal_env_local, 'env', None)
+        if env is not None:
+            env.__exit__(None, None, None)
+        env = rasterio.Env(aws_session, **GDAL_ENV_OPTIONS)
+        env.__enter__()
+        _gdal_env_local.env = env
+        _gdal_env_local.session = aws_session
+    return contextlib.nullcontext()
+
+def _download_s3_object(s3_path, credentials):
+    """Download a whole S3 object with the pooled client"""
+    bucket, key = parse_s3_url(s3_path)
+    response = _s3_client(credentials).get_object(Bucket=bucket, Key=key)
+    return response['Body'].read()
+
+def _display_shape(width, height, max_size=DISPLAY_MAX_SIZE):
+    """
+    Return the (height, width) to read a width x height raster at for display,
+    scaled so neither side exceeds max_size pixels.
+    
+    GDAL picks the best overview for a decimated read on its own.
+    """
+    longest = max(width, height)
+    if longest <= max_size:
+        return height, width
+    return (
+        max(1, int(math.ceil(height * max_size / longest))),
+        max(1, int(math.ceil(width * max_size / longest)))
+    )
+
+def _read_display(dataset, max_size=DISPLAY_MAX_SIZE):
+    """Read the first band of dataset at no more than max_size pixels per side"""
+    height, width = _display_shape(dataset.width, dataset.height, max_size)
+    data = dataset.read(
+        1, out_shape=(height, width), resampling=Resampling.average
+    )
+    # float32 is ample precision for display and halves cache and pickle size
+    if data.dtype == np.float64:
+        data = data.astype(np.float32, copy=False)
+    bounds = tuple(dataset.bounds)
+    transform = tuple(dataset.transform * Affine.scale(
+        dataset.width / width, dataset.height / height
+    ))
+    crs_wkt = dataset.crs.to_wkt() if dataset.crs else None
+    return data, bounds, transform, crs_wkt
+
+def _read_for_display(src, max_size=DISPLAY_MAX_SIZE):
+    """Read the first band of src in the map's CRS at display resolution"""
+    # Rasters already in the map's CRS are read as is, without resampling
+    if src.crs is None or src.crs == DISPLAY_CRS:
+        return _read_display(src, max_size)
+    # Otherwise warp on the fly; GDAL only fetches the source blocks
+    # (or overview blocks) needed for the requested output size
+    with WarpedVRT(src, crs=DISPLAY_CRS, resampling=Resampling.average) as vrt:
+        return _read_display(vrt, max_size)
 
-def load_raster_from_s3(s3_path, aws_session):
+@st.cache_data(max_entries=64, show_spinner=False)
+def _fetch_raster(s3_path, etag, size, _aws_session, _credentials):
+    """
+    Read the first band of a raster from S3 in the map's CRS.
+    
+    Small files are downloaded whole in one request and read from memory,
+    instead of through GDAL's serial range reads. Larger files are opened in
+    place so only the overview blocks needed for display are fetched.
+    
+    Results are cached on (s3_path, etag), so metadata is returned as plain
+    tuples and WKT rather than rasterio objects.
+    """
+    if size <= IN_MEMORY_MAX_BYTES:
+        buf = _download_s3_object(s3_path, _credentials)
+        with rasterio.MemoryFile(buf) as memfile:
+            with memfile.open() as src:
+                return _read_for_display(src)
+    with gdal_env(_aws_session):
+        with rasterio.open(s3_path) as src:
+            return _read_for_display(src)
+
+@st.cache_resource
+def _prefetch_executor():
+    """Thread pool shared across reruns for prefetching rasters"""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+
+def _prefetch_raster(s3_object, aws_session, credentials):
+    """Populate the raster cache for an S3Object"""
+    _fetch_raster(
+        s3_object.url, s3_object.etag, s3_object.size, aws_session, credentials
+    )
+
+def prefetch_neighbors(s3_objects, index, aws_session, credentials):
+    """Start loading the rasters around the selected time step in the background"""
+    lo = max(0, index - PREFETCH_RADIUS)
+    hi = min(len(s3_objects), index + PREFETCH_RADIUS + 1)
+    # Selected time step first, then its neighbours nearest first
+    order = sorted(range(lo, hi), key=lambda i: abs(i - index))
+    window = {s3_objects[i].url for i in order}
+    # Cancel queued prefetches left behind by earlier slider positions so they
+    # don't hold up the new window, and forget finished ones so files whose
+    # cache entry has been evicted or whose object has changed are fetched again
+    prefetch = {}
+    for s3_file, future in st.session_state.get('prefetch', {}).items():
+        if s3_file in window:
+            prefetch[s3_file] = future
+        else:
+            future.cancel()
+    st.session_state['prefetch'] = prefetch
+    executor = _prefetch_executor()
+    for i in order:
+        s3_object = s3_objects[i]
+        if s3_object.url not in prefetch:
+            prefetch[s3_object.url] = executor.submit(
+                _prefetch_raster, s3_object, aws_session, credentials
+            )
+
+def wait_for_prefetch(s3_path):
+    """
+    Wait for a prefetch of s3_path that is already running.
+    
+    A prefetch still queued behind other work is cancelled instead, so the
+    caller loads the raster directly rather than waiting on the queue.
+    """
+    prefetch = st.session_state.get('prefetch', {})
+    future = prefetch.get(s3_path)
+    if future is None:
+        return
+    if future.cancel():
+        del prefetch[s3_path]
+    else:
+        # Running or finished; errors are reported by the foreground load
+        wait([future])
+
+def load_raster_from_s3(s3_path, etag, size, aws_session, credentials):
     """Load raster data from S3 using rasterio with AWS session"""
     try:
-        with rasterio.Env(aws_session):
-            with rasterio.open(s3_path) as src:
-                data = src.read(1)  # Read the first band
-                bounds = src.bounds
-                transform = src.transform
-                crs = src.crs
-        return data, bounds, transform, crs
+        data, bounds, transform, crs_wkt = _fetch_raster(
+            s3_path, etag, size, aws_session, credentials
+        )
+        bounds = BoundingBox(*bounds)
+        transform = Affine(*transform[:6])
+        crs = CRS.from_wkt(crs_wkt) if crs_wkt else None
+        # Computed once and shared by the statistics and the overlay alpha
+        finite_mask = np.isfinite(data)
+        return data, finite_mask, bounds, transform, crs
+    except ValueError as e:
+        if "Thresholds are not sorted" in str(e):
+            st.error("Error reading raster file: Thresholds are not sorted. This is a known issue with some GeoTIFF files from S3.")
+            st.info("Please try a different GeoTIFF file or contact the data provider.")
+        else:
+            st.error(f"Error reading raster from S3: {str(e)}")
+        return None, None, None, None, None
     except Exception as e:
         st.error(f"Error reading raster from S3: {str(e)}")
-        return None, None, None, None
+        return None, None, None, None, None
+
+def zarr_store_key(prefix):
+    """
+    Return the key of the Zarr store for the GeoTIFFs under a prefix.
+    
+    The store sits beside the prefix (prefix/path -> prefix/path.zarr) rather
+    than inside it, so listing the GeoTIFFs never pages through its chunk keys.
+    There is no such key for the bucket root, so None is returned for it.
+    """
+    prefix = prefix.strip('/')
+    return f"{prefix}{ZARR_STORE_SUFFIX}" if prefix else None
+
+@st.cache_data(ttl=300, show_spinner=False)
+def find_zarr_store(bucket, prefix, credentials):
+    """
+    Return the (URL, ETag) of the Zarr store built by build_zarr.py for the
+    GeoTIFFs under a prefix, or None if there is none.
+    """
+    key = zarr_store_key(prefix)
+    if key is None:
+        return None
+    try:
+        response = _s3_client(credentials).head_object(
+            Bucket=bucket, Key=f"{key}/.zmetadata"
+        )
+    except ClientError:
+        return None
+    return f"s3://{bucket}/{key}", response['ETag']
+
+@st.cache_resource(show_spinner=False)
+def open_zarr_store(zarr_url, etag, credentials):
+    """Open a consolidated Zarr store lazily; None if xarray is not installed"""
+    if xr is None:
+        return None
+    return xr.open_zarr(
+        zarr_url,
+        consolidated=True,
+        storage_options={
+            'key': credentials['access_key_id'],
+            'secret': credentials['secret_access_key'],
+            'client_kwargs': {'region_name': credentials['region']}
+        }
+    )
+
+def open_current_zarr_store(bucket, prefix, s3_objects, credentials):
+    """
+    Return (URL, ETag, dataset) for a Zarr store built from exactly the listed
+    GeoTIFFs, or None to read the GeoTIFFs directly.
+    
+    The store is optional, so any failure to find or open it falls back to
+    the GeoTIFFs with a warning rather than stopping the viewer.
+    """
+    try:
+        zarr_store = find_zarr_store(bucket, prefix, credentials)
+        if zarr_store is None:
+            return None
+        zarr_url, zarr_etag = zarr_store
+        ds = open_zarr_store(zarr_url, zarr_etag, credentials)
+        # Ignore a store built from other versions of the GeoTIFFs
+        source_etags = [obj.etag for obj in s3_objects]
+        if ds is None or ds.attrs.get(ZARR_SOURCE_ETAGS) != source_etags:
+            return None
+        return zarr_url, zarr_etag, ds
+    except Exception as e:
+        st.sidebar.warning(f"Zarr store unavailable, reading GeoTIFFs instead: {str(e)}")
+        return None
+
+def load_raster_from_zarr(ds, index):
+    """Load one time step of a Zarr store written by build_zarr.py"""
+    try:
+        data = ds[ZARR_VARIABLE].isel(time=index).values
+        x = ds['x'].values
+        y = ds['y'].values
+        # Coordinates are pixel centres
+        dx = x[1] - x[0] if x.size > 1 else 1.0
+        dy = y[1] - y[0] if y.size > 1 else -1.0
+        transform = Affine(dx, 0.0, x[0] - dx / 2, 0.0, dy, y[0] - dy / 2)
+        bounds = BoundingBox(*array_bounds(data.shape[0], data.shape[1], transform))
+        return data, np.isfinite(data), bounds, transform, DISPLAY_CRS
+    except Exception as e:
+        st.error(f"Error reading raster from Zarr: {str(e)}")
+        return None, None, None, None, None
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _render_bitmap_url(source, etag, index, vmin, vmax, _data, _finite_mask):
+    """
+    Colorize a raster and encode it as a PNG data URL for a deck.gl BitmapLayer.
+    
+    Cached on the source version, time step and colour range, so moving back
+    to a previously viewed time step skips colorizing and encoding.
+    """
+    colormap = create_colormap(vmin, vmax)
+    rgba = colorize(_data, _finite_mask, colormap, vmin, vmax)
+    buf = io.BytesIO()
+    # Favour encoding speed over size; the image is only sent to the browser
+    Image.fromarray(rgba).save(
+        buf, format='PNG', optimize=False, compress_level=1
+    )
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode('ascii')
+
+def build_raster_deck(image_url, bounds):
+    """Build a pydeck map showing a raster image over the given bounds"""
+    left, bottom, right, top = bounds
+    layer = pdk.Layer(
+        "BitmapLayer",
+        image=image_url,
+        bounds=[left, bottom, right, top],
+        opacity=0.7
+    )
+    view_state = pdk.ViewState(
+        latitude=(bottom + top)/2,
+        longitude=(left + right)/2,
+        zoom=10
+    )
+    return pdk.Deck(layers=[layer], initial_view_state=view_state, height=MAP_HEIGHT)
+
+def _flood_features(data, transform, threshold, time):
+    """GeoJSON polygon features outlining the pixels of data above threshold"""
+    with np.errstate(invalid='ignore'):
+        mask = data > threshold
+    return [
+        {
+            'type': 'Feature',
+            'geometry': geometry,
+            'properties': {
+                'time': time,
+                'style': {'color': 'red', 'fillColor': 'red', 'weight': 1}
+            }
+        }
+        for geometry, _ in shapes(mask.astype(np.uint8), mask=mask, transform=transform)
+    ]
+
+def _read_flood_grid(s3_object, aws_session):
+    """Read a raster on the coarse grid used for the flood animation"""
+    with gdal_env(aws_session):
+        with rasterio.open(s3_object.url) as src:
+            return _read_for_display(src, FLOOD_GRID_SIZE)
+
+@st.cache_resource(ttl=300, show_spinner=False)
+def _render_flood_animation_html(s3_objects, threshold, _aws_session):
+    """
+    Render every time step's flood extent as one TimestampedGeoJson map.
+    
+    Rasters are read on a coarse grid of at most FLOOD_GRID_SIZE pixels per
+    side, straight from their overviews and bypassing the display cache, and
+    at most FLOOD_MAX_FEATURES polygons are drawn in total. The files carry no
+    timestamps, so time steps are laid out one period apart and stepped through
+    by the Leaflet time control in the browser.
+    
+    Returns (html, skipped file names, whether polygons were truncated); html
+    is None if no raster could be read.
+    """
+    def load(s3_object):
+        try:
+            return _read_flood_grid(s3_object, _aws_session)
+        except Exception:
+            return None
+    
+    with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+        rasters = list(executor.map(load, s3_objects))
+    
+    skipped = []
+    features = []
+    truncated = False
+    map_bounds = None
+    for i, (s3_object, raster) in enumerate(zip(s3_objects, rasters)):
+        if raster is None:
+            skipped.append(os.path.basename(s3_object.url))
+            continue
+        data, bounds, transform, _ = raster
+        map_bounds = map_bounds or bounds
+        if truncated:
+            continue
+        time = (ANIMATION_START + i * ANIMATION_PERIOD).isoformat()
+        step_features = _flood_features(data, Affine(*transform[:6]), threshold, time)
+        if len(features) + len(step_features) > FLOOD_MAX_FEATURES:
+            truncated = True
+            continue
+        features.extend(step_features)
+    
+    if map_bounds is None:
+        return None, skipped, truncated
+    
+    left, bottom, right, top = map_bounds
+    m = folium.Map(
+        location=[(bottom + top)/2, (left + right)/2],
+        zoom_start=10
+    )
+    TimestampedGeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        transition_time=200,
+        period='PT1H',
+        duration='PT1H',
+        auto_play=False
+    ).add_to(m)
+    
+    return m.get_root().render(), skipped, truncated
+
+RasterStats = namedtuple('RasterStats', ['min', 'max', 'mean', 'std'])
+
+def _raster_stats(a, finite_mask):
+    """Compute min, max, mean and std of the values of an array where finite_mask is set"""
+    v = a[finite_mask]
+    n = v.size
+    if n == 0:
+        return RasterStats(np.nan, np.nan, np.nan, np.nan)
+    s = v.sum(dtype=np.float64)
+    ss = np.einsum('i,i->', v, v, dtype=np.float64)
+    mean = s / n
+    std = np.sqrt(max(ss / n - mean ** 2, 0.0))
+    return RasterStats(v.min(), v.max(), mean, std)
 
 def main():
     st.title("Temporal Rainfall and Flood Map Viewer")
@@ -116,11 +599,7 @@ def main():
     # Only proceed if we have credentials
     if all([aws_credentials['access_key_id'], aws_credentials['secret_access_key']]):
         # Initialize AWS session
-        aws_session = AWSSession(
-            aws_access_key_id=aws_credentials['access_key_id'],
-            aws_secret_access_key=aws_credentials['secret_access_key'],
-            region_name=aws_credentials['region']
-        )
+        aws_session = get_aws_session(aws_credentials)
         
         # Sidebar controls
         st.sidebar.header("Data Source")
@@ -134,8 +613,15 @@ def main():
                 bucket_name, prefix = parse_s3_url(s3_path)
                 
                 # List available files in S3
-                s3_files = list_s3_files(bucket_name, prefix, aws_credentials)
-                
+                try:
+                    s3_objects = list_s3_files(bucket_name, prefix, aws_credentials)
+                except NoCredentialsError:
+                    st.error("AWS credentials not found or invalid")
+                    return
+                except Exception as e:
+                    st.error(f"Error accessing S3: {str(e)}")
+                    return
+                s3_files = [obj.url for obj in s3_objects]
                 
                 if s3_files:
                     st.sidebar.success(f"Found {len(s3_files)} GeoTIFF files")
@@ -154,83 +640,100 @@ def main():
                     # Display current file path
                     st.sidebar.text(f"Current file: {current_file}")
                     
-                                      
-                    try:
-                        with rasterio.Env(aws_session):
-                            with rasterio.open(current_file) as src:
-                                data = src.read(1)
-                                bounds = src.bounds
-                                transform = src.transform
-                                crs = src.crs
-                    except ValueError as e:
-                        if "Thresholds are not sorted" in str(e):
-                            st.error("Error reading raster file: Thresholds are not sorted. This is a known issue with some GeoTIFF files from S3.")
-                            st.info("Please try a different GeoTIFF file or contact the data provider.")
-                            return
-                        else:
-                            st.error(f"Error reading raster from S3: {str(e)}")
-                            return
+                    # Flood animation controls, independent of the selected time step
+                    st.sidebar.subheader("Flood Animation")
+                    show_flood_animation = st.sidebar.checkbox(
+                        "Show flood extent animation", key='show_flood_animation'
+                    )
+                    if show_flood_animation:
+                        # No default: what counts as flooded depends on the data's units
+                        flood_threshold = st.sidebar.number_input(
+                            "Flood threshold",
+                            value=None,
+                            placeholder="Value above which a pixel is flooded",
+                            key='flood_threshold'
+                        )
                     
-                    # Create the map
-                    m = folium.Map(
-                        location=[(bounds.bottom + bounds.top)/2, 
-                                 (bounds.left + bounds.right)/2],
-                        zoom_start=10
+                                      
+                    # Prefer a pre-built Zarr store of the time series when present
+                    zarr_store = open_current_zarr_store(
+                        bucket_name, prefix, s3_objects, aws_credentials
                     )
                     
-                    # Create colormap
-                    colormap = create_colormap(data)
+                    if zarr_store is not None:
+                        source, etag, zarr_ds = zarr_store
+                        data, finite_mask, bounds, transform, crs = load_raster_from_zarr(
+                            zarr_ds, selected_time_index
+                        )
+                    else:
+                        prefetch_neighbors(
+                            s3_objects, selected_time_index, aws_session, aws_credentials
+                        )
+                        wait_for_prefetch(current_file)
+                        current_object = s3_objects[selected_time_index]
+                        etag, size = current_object.etag, current_object.size
+                        source = current_file
+                        data, finite_mask, bounds, transform, crs = load_raster_from_s3(
+                            current_file, etag, size, aws_session, aws_credentials
+                        )
+                    if data is None:
+                        return
                     
-                    # Add the raster layer
-                    img = folium.raster_layers.ImageOverlay(
-                        data,
-                        bounds=[[bounds.bottom, bounds.left], 
-                               [bounds.top, bounds.right]],
-                        colormap=lambda x: colormap(x),
-                        opacity=0.7,
-                        name=f'Raster Layer {selected_time_index}'
-                    )
-                    img.add_to(m)
+                    # Compute statistics once; reused by the colormap and the sidebar
+                    stats = _raster_stats(data, finite_mask)
                     
-                    # Add layer control
-                    folium.LayerControl().add_to(m)
+                    # Encode the raster once per version; the browser composites
+                    # it on the GPU, so panning and zooming never rerun the app
+                    image_url = _render_bitmap_url(
+                        source,
+                        etag,
+                        selected_time_index,
+                        float(stats.min),
+                        float(stats.max),
+                        _data=data,
+                        _finite_mask=finite_mask
+                    )
                     
                     # Display the map
-                    col1, col2 = st.columns([3, 1])
-                    
-                    with col1:
-                        folium_static(m)
+                    st.pydeck_chart(build_raster_deck(image_url, tuple(bounds)))
                     
-                    # Add pixel value identifier
-                    with col2:
-                        st.subheader("Pixel Value Identifier")
-                        st.write("Click on the map to identify pixel values")
-                        
-                        # Create an empty placeholder for pixel values
-                        pixel_value_container = st.empty()
-                        
-                        # Add click event handler
-                        if st.session_state.get('last_clicked') is not None:
-                            lat, lon = st.session_state.last_clicked
-                            # Convert coordinates to pixel indices
-                            py, px = ~transform * (lon, lat)
-                            px, py = int(px), int(py)
-                            
-                            if 0 <= px < data.shape[1] and 0 <= py < data.shape[0]:
-                                value = data[py, px]
-                                pixel_value_container.write(f"""
-                                    **Coordinates:** ({lat:.6f}, {lon:.6f})  
-                                    **Value:** {value:.2f}
-                                """)
+                    # Animate the flood extent over all time steps in the browser
+                    if show_flood_animation:
+                        st.subheader("Flood Extent Over Time")
+                        if flood_threshold is None:
+                            st.info("Enter a flood threshold in the sidebar to build the animation")
+                        else:
+                            flood_html, skipped, truncated = _render_flood_animation_html(
+                                tuple(s3_objects),
+                                flood_threshold,
+                                _aws_session=aws_session
+                            )
+                            if skipped:
+                                st.warning(
+                                    f"Skipped {len(skipped)} unreadable file(s): "
+                                    + ", ".join(skipped[:10])
+                                    + (" ..." if len(skipped) > 10 else "")
+                                )
+                            if truncated:
+                                st.warning(
+                                    f"Flood extent limited to the first {FLOOD_MAX_FEATURES} "
+                                    "polygons; later time steps are not shown"
+                                )
+                            if flood_html is not None:
+                                components.html(flood_html, height=MAP_HEIGHT)
                     
                     # Display statistics
                     st.sidebar.subheader("Statistics")
+                    st.sidebar.caption(
+                        f"Computed on the displayed raster, averaged down to at most "
+                        f"{DISPLAY_MAX_SIZE} px per side; isolated peaks may be under-reported."
+                    )
                     st.sidebar.write(f"""
                         **File:** {os.path.basename(current_file)}  
-                        **Min:** {np.nanmin(data):.2f}  
-                        **Max:** {np.nanmax(data):.2f}  
-                        **Mean:** {np.nanmean(data):.2f}  
-                        **Std:** {np.nanstd(data):.2f}
+                        **Min:** {stats.min:.2f}  
+                        **Max:** {stats.max:.2f}  
+                        **Mean:** {stats.mean:.2f}  
+                        **Std:** {stats.std:.2f}
                     """)
                 else:
                     st.warning("No GeoTIFF files found in the specified S3 path")
@@ -240,15 +743,58 @@ def main():
     else:
         st.error("AWS credentials are required. Please provide them through environment variables, secrets.toml, or in the sidebar.")
 
-def create_colormap(data, colormap_name='YlOrRd'):
+def create_colormap(vmin, vmax, colormap_name='YlOrRd'):
     """Create a colormap based on data range"""
-    vmin = np.nanmin(data)
-    vmax = np.nanmax(data)
     return LinearColormap(
         colors=['yellow', 'orange', 'red'],
         vmin=vmin,
         vmax=vmax
     )
 
+def colormap_lut(colormap, n=256):
+    """Convert a colormap to an n-step (n, 4) uint8 table over its own range"""
+    stepped = colormap.to_step(n=n)
+    return np.round(np.asarray(stepped.colors) * 255).astype(np.uint8)
+
+def _colorize_numpy(data, finite_mask, lut, vmin, scale, out):
+    """Vectorized NumPy fallback for _colorize_kernel"""
+    with np.errstate(invalid='ignore'):
+        idx = np.clip((data - vmin) * scale, 0, 255)
+    idx[~finite_mask] = 0
+    out[...] = lut[idx.astype(np.uint8)]
+    out[~finite_mask, 3] = 0
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _colorize_kernel(data, finite_mask, lut, vmin, scale, out):
+        """Fused quantize and LUT lookup in a single pass over data"""
+        H, W = data.shape
+        for i in prange(H):
+            for j in range(W):
+                if not finite_mask[i, j]:
+                    out[i, j, 0] = 0
+                    out[i, j, 1] = 0
+                    out[i, j, 2] = 0
+                    out[i, j, 3] = 0
+                    continue
+                k = min(255, max(0, int((data[i, j] - vmin) * scale)))
+                out[i, j, 0] = lut[k, 0]
+                out[i, j, 1] = lut[k, 1]
+                out[i, j, 2] = lut[k, 2]
+                out[i, j, 3] = lut[k, 3]
+else:
+    _colorize_kernel = _colorize_numpy
+
+def colorize(data, finite_mask, colormap, vmin, vmax):
+    """Map a 2D array to an (H, W, 4) uint8 RGBA image, transparent outside finite_mask"""
+    lut = colormap_lut(colormap)
+    scale = 255.0 / (vmax - vmin) if vmax > vmin else 0.0
+    rgba = np.empty(data.shape + (4,), np.uint8)
+    _colorize_kernel(
+        np.ascontiguousarray(data), np.ascontiguousarray(finite_mask),
+        lut, vmin, scale, rgba
+    )
+    return rgba
+
 if __name__ == "__main__":
     main()